@@ -1,52 +1,138 @@
 import asyncio
 import json
 import os
-import re
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from dotenv import load_dotenv
-from playwright.async_api import async_playwright, Page
+from playwright.async_api import async_playwright, BrowserContext, Page
 
 # Configuration
 ROOT = Path(__file__).resolve().parent
-STORAGE_FILE = ROOT / "storage_state.json"
-OUTPUT_FILE = ROOT / "products.json"
+USER_DATA_DIR = ROOT / "user_data"
+OUTPUT_FILE = ROOT / "products.jsonl"
 ENV_PATH = ROOT / ".env"
 
+# orjson serializes 3-5x faster than stdlib json; fall back silently if absent
+try:
+    import orjson
+
+    def _dumps(obj: Any) -> str:
+        return orjson.dumps(obj).decode()
+except ImportError:
+    def _dumps(obj: Any) -> str:
+        return json.dumps(obj, ensure_ascii=False)
+
+
+def load_seen_ids() -> set:
+    """IDs already streamed to OUTPUT_FILE by a previous (interrupted) run."""
+    seen: set = set()
+    if OUTPUT_FILE.exists():
+        with open(OUTPUT_FILE, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    seen.add(json.loads(line)["id"])
+                except:
+                    continue  # torn last line from a crash is fine to drop
+    return seen
+
 load_dotenv(dotenv_path=str(ENV_PATH))
 EMAIL = os.getenv("EMAIL")
 PASSWORD = os.getenv("PASSWORD")
 HEADLESS = os.getenv("HEADLESS", "true").lower() in ("1", "true", "yes")
 TARGET_URL = os.getenv("TARGET_URL")
+LOGIN_URL = (TARGET_URL or "").rstrip("/") + "/login"
+# Optional sharding: comma-separated category filters, e.g. "Audio,Books,Toys".
+# Each shard scrapes its filtered slice of the table in its own page.
+SHARD_CATEGORIES = [s.strip() for s in os.getenv("SHARD_CATEGORIES", "").split(",") if s.strip()]
+SHARD_CONCURRENCY = int(os.getenv("SHARD_CONCURRENCY", "5"))
+# Resume an interrupted scrape: keep products.jsonl, skip IDs already on disk
+RESUME = os.getenv("RESUME", "false").lower() in ("1", "true", "yes")
+
+# In-page matcher for the "showing N of M" banner; returns M or 0
+SHOWING_COUNT_JS = (
+    "() => { const m = document.body.innerText.match(/showing\\s+\\d+\\s+of\\s+(\\d+)/i);"
+    " return m ? +m[1] : 0; }"
+)
+
+# Button labels that are navigation, not wizard options. One regex
+# alternation matches all of them in a single linear pass.
+SKIP_BUTTON_WORDS = "next|back|cancel|skip|close|sign"
+
+# Click the first enabled, visible, non-navigation button in-browser
+OPTION_CLICK_JS = """
+    () => {
+        const btns = [...document.querySelectorAll('button')]
+            .filter(b => b.offsetParent && !b.disabled);
+        const skip = /%s/i;
+        for (const b of btns) {
+            const t = b.innerText.trim();
+            if (t && !skip.test(t)) { b.click(); return t; }
+        }
+        return null;
+    }
+""" % SKIP_BUTTON_WORDS
+
+
+# Resource types the scraper never needs. Stylesheets are kept: visibility
+# checks (offsetParent, :visible) rely on real layout.
+BLOCKED_RESOURCE_TYPES = {"image", "font", "media"}
+BLOCKED_URL_SNIPPETS = (
+    "google-analytics", "googletagmanager", "doubleclick",
+    "hotjar", "segment.io", "facebook.net",
+)
+
+
+async def block_heavy_resources(context: BrowserContext) -> None:
+    """Abort image/font/media and tracker requests to speed up navigation."""
+    async def _route(route):
+        req = route.request
+        if req.resource_type in BLOCKED_RESOURCE_TYPES or any(s in req.url for s in BLOCKED_URL_SNIPPETS):
+            await route.abort()
+        else:
+            await route.continue_()
+
+    await context.route("**/*", _route)
 
 
 async def is_logged_in(page: Page) -> bool:
     """Check if user is logged in"""
     try:
-        if await page.query_selector("text=Launch Challenge"):
+        if await page.locator("text=Launch Challenge").count():
             return True
-        if await page.query_selector("input[type=\"email\"]") or await page.query_selector("text=Sign in"):
+        if await page.locator("input[type=\"email\"]").count() or await page.locator("text=Sign in").count():
             return False
-        if await page.query_selector("text=Logout"):
+        if await page.locator("text=Logout").count():
             return True
     except:
         pass
     return False
 
 
+async def _wait_for_login_result(page: Page) -> None:
+    """
+    Wait for a post-login marker instead of sleeping a fixed 2 s: returns the
+    moment login lands (no wasted wait) and tolerates slow logins that a blind
+    sleep would misreport as failures.
+    """
+    try:
+        await page.wait_for_selector(":text('Launch Challenge'), :text('Logout')", timeout=10000)
+    except:
+        pass  # is_logged_in() delivers the verdict either way
+
+
 async def try_login(page: Page) -> bool:
     """Attempt login with credentials"""
     if not EMAIL or not PASSWORD:
         print("Missing credentials")
         return False
 
-    # Try clicking sign-in button
+    # Try clicking sign-in button; the email-input wait below covers the
+    # form-render delay, no sleep needed
     for sel in ["text=Sign in", "text=Login"]:
         try:
             btn = await page.query_selector(sel)
             if btn:
                 await btn.click()
-                await page.wait_for_timeout(500)
                 break
         except:
             pass
@@ -69,16 +155,15 @@ async def try_login(page: Page) -> bool:
             except:
                 pass
 
-        await page.wait_for_timeout(2000)
+        await _wait_for_login_result(page)
     except:
-        # Try direct navigation to login
+        # Try direct navigation to login; fill() auto-waits for the inputs
         try:
-            await page.goto(TARGET_URL.rstrip("/") + "/login")
-            await page.wait_for_timeout(1000)
+            await page.goto(LOGIN_URL)
             await page.fill("input[type=\"email\"]", EMAIL)
             await page.fill("input[type=\"password\"]", PASSWORD)
             await page.click("button[type=submit]")
-            await page.wait_for_timeout(2000)
+            await _wait_for_login_result(page)
         except:
             pass
 
@@ -88,21 +173,21 @@ async def try_login(page: Page) -> bool:
 async def click_button_by_text(page: Page, texts: List[str]) -> bool:
     """Click button matching any of the given texts"""
     for text in texts:
-        selectors = [
-            f"text=/{text}/i",
-            f"button:has-text(\"{text}\")",
-            f"[role=button]:has-text(\"{text}\")"
-        ]
-
-        for sel in selectors:
-            try:
-                btn = await page.query_selector(sel)
-                if btn and await btn.is_visible() and await btn.is_enabled():
-                    await btn.click()
-                    await page.wait_for_timeout(500)
-                    return True
-            except:
-                continue
+        # One unioned CSS query per text: button / role=button / bare text
+        # match are evaluated in a single pass, so a miss costs one
+        # round-trip instead of three. Locator click runs the
+        # visibility/enabled/stability checks in-browser. No post-click
+        # sleep: callers wait on their own next-step markers.
+        sel = (
+            f"button:has-text(\"{text}\"), "
+            f"[role=button]:has-text(\"{text}\"), "
+            f":text-matches(\"{text}\", \"i\")"
+        )
+        try:
+            await page.locator(sel).first.click(timeout=500)
+            return True
+        except:
+            continue
     return False
 
 
@@ -114,20 +199,27 @@ async def complete_step(page: Page, option_texts: List[str] = None) -> bool:
         clicked = await click_button_by_text(page, option_texts)
 
     if not clicked:
+        # Pick and click the first enabled, visible, non-navigation button
+        # entirely in-browser: one CDP call instead of one per button text read
         try:
-            buttons = await page.query_selector_all("button:visible")
-            for btn in buttons:
-                text = (await btn.inner_text()).strip().lower()
-                if text and not any(x in text for x in ("next", "back", "cancel", "skip", "close", "sign")):
-                    await btn.click()
-                    clicked = True
-                    await page.wait_for_timeout(400)
-                    break
+            clicked_text = await page.evaluate(OPTION_CLICK_JS)
+            if clicked_text:
+                clicked = True
+                # Wait for the step UI to react instead of sleeping blindly
+                try:
+                    await page.wait_for_selector("button:has-text('Next')", state="visible", timeout=2000)
+                except:
+                    pass
         except:
             pass
 
     next_clicked = await click_button_by_text(page, ["Next", "Continue", "View Products"])
-    await page.wait_for_timeout(800)
+    if next_clicked:
+        # The next step (or the table) renders its own controls; wait for either
+        try:
+            await page.wait_for_selector("button:has-text('Next'), table, tbody tr", state="visible", timeout=2000)
+        except:
+            pass
 
     return clicked or next_clicked
 
@@ -144,8 +236,7 @@ async def find_table_container(page: Page) -> str:
     ]
     for sel in selectors:
         try:
-            el = await page.query_selector(sel)
-            if el and await el.is_visible():
+            if await page.locator(sel).first.is_visible():
                 return sel
         except:
             continue
@@ -153,24 +244,111 @@ async def find_table_container(page: Page) -> str:
     return "table"
 
 
-async def extract_new_products(page: Page, table_sel: str, seen_ids: set) -> List[Dict[str, Any]]:
-    """
-    Extract only newly visible rows efficiently (single DOM roundtrip).
-    Deduplicate by the first column (ID).
-    """
-    rows = await page.evaluate("""
-        (sel) => {
-            const table = document.querySelector(sel);
-            if (!table) return [];
-            const trs = Array.from(table.querySelectorAll('tbody tr'))
-                .filter(r => r.offsetParent !== null);
-            return trs.map(tr => {
-                const tds = Array.from(tr.querySelectorAll('td'));
-                return tds.map(td => td.innerText.trim());
+# One-shot init: resolve the scrollable ancestor of the table once, park it on
+# window.__scroller, and reset it to the top. getComputedStyle forces a style
+# recompute, so the parent-chain walk must not run on every scroll round.
+INIT_SCROLLER_JS = """
+    ([sel, known]) => {
+        const table = document.querySelector(sel);
+        if (!table) return false;
+
+        let scroller = null;
+        let node = table;
+        while (node && node !== document.body) {
+            const s = getComputedStyle(node);
+            const oy = s.overflowY;
+            if ((oy === 'auto' || oy === 'scroll') && node.scrollHeight > node.clientHeight + 1) {
+                scroller = node;
+                break;
+            }
+            node = node.parentElement;
+        }
+        if (!scroller) {
+            // fallback: search descendants (rare)
+            for (const d of table.querySelectorAll('div')) {
+                const s2 = getComputedStyle(d);
+                const oy2 = s2.overflowY;
+                if ((oy2 === 'auto' || oy2 === 'scroll') && d.scrollHeight > d.clientHeight + 1) {
+                    scroller = d;
+                    break;
+                }
+            }
+        }
+
+        window.__scroller = scroller;
+        // Dedup state lives in the page: rows are serialized across CDP at most
+        // once instead of re-shipping the whole visible window every round.
+        // `known` seeds IDs already persisted by a previous (resumed) run.
+        window.__seenIds = new Set(known || []);
+        window.__collected = [];
+
+        // Push-style collection: extract every <tr> the moment the virtualizer
+        // mounts it, so rows that appear and vanish between scroll rounds are
+        // never missed. __collected acts as a drain buffer for Python.
+        const collectRow = (tr) => {
+            if (!tr.cells || !tr.cells.length) return;
+            if (tr.offsetParent === null) return;  // display:none placeholders
+            const cells = Array.from(tr.cells).map(td => td.textContent.trim());
+            const id = cells[0];
+            if (!id || window.__seenIds.has(id)) return;
+            window.__seenIds.add(id);
+            window.__collected.push(cells);
+        };
+        window.__collectRow = collectRow;
+
+        if (window.__mo) window.__mo.disconnect();
+        const tbody = table.tBodies[0];
+        if (tbody) {
+            for (const tr of tbody.rows) collectRow(tr);  // already mounted
+            window.__mo = new MutationObserver(muts => {
+                for (const m of muts)
+                    for (const n of m.addedNodes)
+                        if (n.tagName === 'TR') collectRow(n);
             });
+            window.__mo.observe(tbody, {childList: true, subtree: true});
         }
-    """, table_sel)
 
+        if (scroller) scroller.scrollTop = 0;
+        return !!scroller;
+    }
+"""
+
+# Single round-trip worker: sweep the rendered rows, advance the scroller and
+# drain the MutationObserver buffer in one evaluate. The sweep matters because
+# some virtualizers recycle <tr> nodes in place, which the childList observer
+# never sees. Only rows never seen before cross the CDP boundary.
+SCROLL_AND_COLLECT_JS = """
+    (sel) => {
+        const table = document.querySelector(sel);
+        if (!table) return {ok: false, reason: 'no-table', rows: []};
+
+        const tbody = table.tBodies[0];
+        if (tbody && window.__collectRow) {
+            for (const tr of tbody.rows) window.__collectRow(tr);
+        }
+
+        // Everything gathered since the last drain (observer pushes + sweep)
+        const rows = window.__collected ? window.__collected.splice(0) : [];
+        const rowCount = tbody ? tbody.rows.length : 0;
+
+        const scroller = window.__scroller;
+        if (!scroller) return {ok: false, reason: 'no-scroller', rows, rowCount};
+
+        const prev = scroller.scrollTop;
+        const max = scroller.scrollHeight - scroller.clientHeight;
+        scroller.scrollTop = Math.min(prev + scroller.clientHeight, max);
+
+        return {ok: true, rows, rowCount, prev, now: scroller.scrollTop, max};
+    }
+"""
+
+
+def extract_new_products(rows: List[List[str]], seen_ids: set) -> List[Dict[str, Any]]:
+    """
+    Map raw row cells (already deduped in-page) to product dicts.
+    seen_ids is kept as a Python-side guard in case the page state resets
+    (navigation wipes window.__seenIds).
+    """
     new_items: List[Dict[str, Any]] = []
     for cells in rows:
         if not cells:
@@ -188,25 +366,47 @@ async def extract_new_products(page: Page, table_sel: str, seen_ids: set) -> Lis
             "price": cells[4] if len(cells) > 4 else "",
             "product": cells[5] if len(cells) > 5 else "",
             "score": cells[6] if len(cells) > 6 else "",
-            "cells": cells,  # keep raw cells too
         }
+        if len(cells) > 7:
+            # unexpected extra columns: keep the raw cells for inspection
+            item["cells"] = cells
         new_items.append(item)
     return new_items
 
 
-async def scroll_and_collect_all(page: Page, table_sel: str, target_count: int = 2849) -> List[Dict[str, Any]]:
+async def scroll_and_collect_all(page: Page, table_sel: str, target_count: int = 2849) -> int:
     """
     Efficiently scroll a VIRTUALIZED table by scrolling its true scrollable ancestor.
-    Continues "indefinitely" until the table stops loading more rows:
-    - We detect exhaustion when the scroller is at bottom and no new rows appear for several rounds.
+    Rows are streamed to OUTPUT_FILE as newline-delimited JSON the moment they
+    are extracted, so memory stays flat regardless of table size. With RESUME
+    set, IDs already in OUTPUT_FILE are skipped and new rows are appended.
+    Returns the number of products written this run. Continues "indefinitely" until the table stops
+    loading more rows:
+    - We detect exhaustion when the scroller is at bottom and scrollHeight and
+      row count stay stable for two consecutive rounds.
     - A large safety ceiling prevents literal infinity in case of a pathological page.
     """
-    products: List[Dict[str, Any]] = []
-    seen_ids: set = set()
+    seen_ids = load_seen_ids() if RESUME else set()
+    if seen_ids:
+        print(f"Resuming: {len(seen_ids)} products already on disk, appending new ones")
+    # Line buffering keeps every completed row durable on disk, so a crash
+    # mid-scroll loses at most the row being written
+    with open(OUTPUT_FILE, "a" if RESUME else "w", buffering=1, encoding="utf-8") as out:
+        return await _collect_into(page, table_sel, target_count, out, seen_ids)
+
+
+async def _collect_into(page: Page, table_sel: str, target_count: int, out,
+                        seen_ids: Optional[set] = None) -> int:
+    written = 0
+    if seen_ids is None:
+        seen_ids = set()
     attempts = 0
     no_progress_rounds = 0
     last_count = 0
-    safety_ceiling = 20000  # very high cap to avoid true infinites
+    stable_bottom_rounds = 0
+    last_scroll_max = None
+    last_row_count = None
+    safety_ceiling = 20000  # backstop only; stability check below exits first
 
     print(f"Starting collection (until exhausted). Target hint: {target_count}")
 
@@ -218,144 +418,179 @@ async def scroll_and_collect_all(page: Page, table_sel: str, target_count: int =
     except:
         pass
 
-    # Reset scroller to top once before starting
-    await page.evaluate("""
-        (sel) => {
-            const table = document.querySelector(sel);
-            if (!table) return;
-            const getScroller = (el) => {
-                let node = el;
-                while (node && node !== document.body) {
-                    const s = getComputedStyle(node);
-                    const oy = s.overflowY;
-                    if ((oy === 'auto' || oy === 'scroll') && node.scrollHeight > node.clientHeight + 1) {
-                        return node;
-                    }
-                    node = node.parentElement;
-                }
-                // fallback: search descendants (rare)
-                for (const d of table.querySelectorAll('div')) {
-                    const s2 = getComputedStyle(d);
-                    const oy2 = s2.overflowY;
-                    if ((oy2 === 'auto' || oy2 === 'scroll') && d.scrollHeight > d.clientHeight + 1) {
-                        return d;
-                    }
-                }
-                return null;
-            };
-            const scroller = getScroller(table);
-            if (scroller) scroller.scrollTop = 0;
-        }
-    """, table_sel)
+    # Resolve the scroller once (expensive getComputedStyle walk) and reset to
+    # top; seeds the in-page dedup set with IDs from a resumed run
+    has_scroller = await page.evaluate(INIT_SCROLLER_JS, [table_sel, sorted(seen_ids)])
+    if not has_scroller:
+        print("Warning: no scrollable ancestor found for table; collecting visible rows only")
+
+    # Fast path: some virtualizers debounce programmatic scrollTop writes but
+    # respond immediately to keyboard nav, and a few render ALL rows once the
+    # view hits the bottom. One End press + row-count-stable poll costs ~2 s
+    # and, when it works, collapses the whole per-viewport loop into one sweep.
+    try:
+        await page.keyboard.press("End")
+        last_rows = await page.evaluate("() => document.querySelectorAll('tbody tr').length")
+        stable_rounds = 0
+        while stable_rounds < 2:
+            try:
+                await page.wait_for_function(
+                    "(prev) => document.querySelectorAll('tbody tr').length !== prev",
+                    arg=last_rows,
+                    timeout=1000,
+                )
+                last_rows = await page.evaluate("() => document.querySelectorAll('tbody tr').length")
+                stable_rounds = 0
+            except:
+                stable_rounds += 1
+
+        scrolled = await page.evaluate(SCROLL_AND_COLLECT_JS, table_sel)
+        new_rows = extract_new_products(scrolled.get("rows") or [], seen_ids)
+        for item in new_rows:
+            out.write(_dumps(item) + "\n")
+        written += len(new_rows)
+        if target_count and written >= target_count:
+            print(f"End-key jump rendered the full table: {written} rows")
+            return written
+        # Partial render only: restart from the top and walk viewport by viewport
+        await page.evaluate("() => { if (window.__scroller) window.__scroller.scrollTop = 0; }")
+    except:
+        pass
 
     while attempts < safety_ceiling:
         attempts += 1
 
-        # Grab newly visible rows (single DOM call)
-        new_rows = await extract_new_products(page, table_sel, seen_ids)
-        if new_rows:
-            products.extend(new_rows)
-        
+        # One CDP round-trip: read the rendered rows AND advance the scroller
+        scrolled = await page.evaluate(SCROLL_AND_COLLECT_JS, table_sel)
+
+        new_rows = extract_new_products(scrolled.get("rows") or [], seen_ids)
+        for item in new_rows:
+            out.write(_dumps(item) + "\n")
+        written += len(new_rows)
+
         # progress accounting
-        if len(products) > last_count:
-            last_count = len(products)
+        if written > last_count:
+            last_count = written
             no_progress_rounds = 0
         else:
             no_progress_rounds += 1
 
         if attempts % 25 == 0:
-            pct = (len(products) / target_count * 100) if target_count else 0
-            print(f"Progress: {len(products)} items collected ({pct:.1f}% est)")
-
-        # Scroll inside the real scroller (NOT the page, NOT the <table>)
-        scrolled = await page.evaluate("""
-            (sel) => {
-                const table = document.querySelector(sel);
-                if (!table) return {ok:false, reason:'no-table'};
-                const getScroller = (el) => {
-                    let node = el;
-                    while (node && node !== document.body) {
-                        const s = getComputedStyle(node);
-                        const oy = s.overflowY;
-                        if ((oy === 'auto' || oy === 'scroll') && node.scrollHeight > node.clientHeight + 1) {
-                            return node;
-                        }
-                        node = node.parentElement;
-                    }
-                    // fallback: look inside
-                    for (const d of table.querySelectorAll('div')) {
-                        const s2 = getComputedStyle(d);
-                        const oy2 = s2.overflowY;
-                        if ((oy2 === 'auto' || oy2 === 'scroll') && d.scrollHeight > d.clientHeight + 1) {
-                            return d;
-                        }
-                    }
-                    return null;
-                };
-                const scroller = getScroller(table);
-                if (!scroller) return {ok:false, reason:'no-scroller'};
-
-                const prev = scroller.scrollTop;
-                const max = scroller.scrollHeight - scroller.clientHeight;
-                // jump by one viewport
-                const next = Math.min(prev + scroller.clientHeight, max);
-                scroller.scrollTop = next;
-
-                return {ok:true, prev, now: scroller.scrollTop, max};
-            }
-        """, table_sel)
+            pct = (written / target_count * 100) if target_count else 0
+            print(f"Progress: {written} items collected ({pct:.1f}% est)")
+
+        prev_row_count = scrolled.get("rowCount", 0)
+
+        # Exhaustion: virtualizers grow scrollHeight as they discover rows, so
+        # once we are at the bottom and scrollHeight + row count have been
+        # stable for two consecutive rounds, the table has nothing left.
+        if not scrolled.get("ok"):
+            # No table/scroller to advance; stop as soon as extraction dries up
+            if no_progress_rounds >= 2:
+                print(f"Cannot scroll ({scrolled.get('reason')}) and no new rows; stopping.")
+                break
+        else:
+            at_bottom = scrolled.get("now", 0) >= scrolled.get("max", 0)
+            if (at_bottom and not new_rows
+                    and scrolled.get("max") == last_scroll_max
+                    and scrolled.get("rowCount") == last_row_count):
+                stable_bottom_rounds += 1
+                if stable_bottom_rounds >= 2:
+                    print("At bottom with stable scrollHeight and row count; table exhausted.")
+                    break
+            else:
+                stable_bottom_rounds = 0
+            last_scroll_max = scrolled.get("max")
+            last_row_count = scrolled.get("rowCount")
 
-        # Detect exhaustion: at bottom AND no new rows for a few rounds
-        at_bottom = False
-        if scrolled and scrolled.get("ok"):
-            at_bottom = (scrolled.get("now", 0) >= scrolled.get("max", 0))
+        # Wait for the virtualizer to render the next batch (returns the instant
+        # the row set changes; times out quickly when nothing new is coming)
+        try:
+            await page.wait_for_function(
+                "(prev) => document.querySelectorAll('tbody tr').length !== prev",
+                arg=prev_row_count,
+                timeout=1500,
+            )
+        except:
+            pass  # no row change; the exhaustion check above will handle it
 
-        # If we didn't scroll or we're at bottom, and no new rows for several rounds, stop
-        if (not scrolled or not scrolled.get("ok") or scrolled.get("now") == scrolled.get("prev")):
-            if at_bottom and no_progress_rounds >= 5:
-                print("No more movement and no new rows; reached bottom. Stopping.")
-                break
+    print(f"Collection complete: {written} products after {attempts} attempts (exhausted or safety cap)")
+    return written
 
-        # give virtualization time to render next batch
-        await page.wait_for_timeout(200)
 
-    print(f"Collection complete: {len(products)} products after {attempts} attempts (exhausted or safety cap)")
-    return products
+async def scrape_shards(context: BrowserContext, products_url: str,
+                        shards: List[str], target_count: int) -> int:
+    """
+    Scrape disjoint category shards concurrently, one page per shard in the
+    same (already authenticated) context, bounded by a semaphore. All shards
+    stream into OUTPUT_FILE and share one seen_ids set, so overlapping rows
+    are written once. Returns the total number of products written.
+    """
+    sem = asyncio.Semaphore(SHARD_CONCURRENCY)
+    seen_ids: set = load_seen_ids() if RESUME else set()
+    if seen_ids:
+        print(f"Resuming: {len(seen_ids)} products already on disk, appending new ones")
+
+    with open(OUTPUT_FILE, "a" if RESUME else "w", buffering=1, encoding="utf-8") as out:
+
+        async def scrape_shard(category: str) -> int:
+            async with sem:
+                page = await context.new_page()
+                try:
+                    await page.goto(products_url)
+                    try:
+                        await page.wait_for_selector("table, [role=table], tbody tr", timeout=5000)
+                    except:
+                        pass
+                    # Apply the shard filter: a category button, else a search box
+                    if not await click_button_by_text(page, [category]):
+                        try:
+                            await page.fill(
+                                "input[type=search], input[placeholder*='search' i], input[placeholder*='filter' i]",
+                                category,
+                            )
+                        except:
+                            print(f"Shard '{category}': no filter control found; skipping")
+                            return 0
+                    table_sel = await find_table_container(page)
+                    return await _collect_into(page, table_sel, target_count, out, seen_ids)
+                finally:
+                    await page.close()
+
+        counts = await asyncio.gather(*(scrape_shard(c) for c in shards))
+
+    return sum(counts)
 
 
 async def main() -> None:
     print("Starting optimized scraper")
 
     async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=HEADLESS)
-        context = None
+        # Persistent context: cookies/localStorage live in user_data/ across
+        # runs, so there is no storage_state.json to juggle and a stale session
+        # never forces a context teardown + cold relaunch.
+        context = await p.chromium.launch_persistent_context(
+            str(USER_DATA_DIR), headless=HEADLESS
+        )
 
         try:
-            # Handle session storage
-            if STORAGE_FILE.exists():
-                context = await browser.new_context(storage_state=str(STORAGE_FILE))
-                page = await context.new_page()
-                await page.goto(TARGET_URL)
-
-                if not await is_logged_in(page):
-                    await context.close()
-                    context = await browser.new_context()
-                    page = await context.new_page()
-                    await page.goto(TARGET_URL)
-                    if await try_login(page):
-                        await context.storage_state(path=str(STORAGE_FILE))
-            else:
-                context = await browser.new_context()
-                page = await context.new_page()
-                await page.goto(TARGET_URL)
-                if not await is_logged_in(page):
-                    if await try_login(page):
-                        await context.storage_state(path=str(STORAGE_FILE))
+            await block_heavy_resources(context)
+            page = context.pages[0] if context.pages else await context.new_page()
+            await page.goto(TARGET_URL)
+
+            if not await is_logged_in(page):
+                await try_login(page)
 
             # Navigate through challenge steps
             print("Launching challenge...")
             await click_button_by_text(page, ["Launch Challenge", "Start Challenge"])
-            await page.wait_for_timeout(800)
+            # Wait for the step-1 wizard UI rather than a fixed 800 ms
+            try:
+                await page.wait_for_selector(
+                    "button:has-text('Next'), :text('Local Database')", timeout=5000
+                )
+            except:
+                pass
 
             print("Step 1: Selecting data source...")
             await complete_step(page, ["Local Database", "Local DB"])
@@ -381,35 +616,32 @@ async def main() -> None:
             table_sel = await find_table_container(page)
             print(f"Using table selector: {table_sel}")
 
-            # Detect target count if available; ignore obviously wrong zeros
+            # Detect target count if available; ignore obviously wrong zeros.
+            # The regex runs inside the page so only a number crosses CDP,
+            # not the whole rendered body text.
             target_count = 2849  # sensible default for your challenge
-            page_text = await page.evaluate("() => document.body.innerText")
-            match = re.search(r'showing\\s+\\d+\\s+of\\s+(\\d+)', page_text.lower())
-            if match:
-                detected = int(match.group(1))
-                if detected > 0:
-                    target_count = detected
-                    print(f"Detected {target_count} total products")
-                else:
-                    print("Detected total=0 in banner; using default target_count")
-
-            # Collect all products via virtual scroll
-            products = await scroll_and_collect_all(page, table_sel, target_count)
-
-            # Save results
-            print(f"Saving {len(products)} products to {OUTPUT_FILE}")
-            with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-                json.dump(products, f, indent=2, ensure_ascii=False)
+            detected = await page.evaluate(SHOWING_COUNT_JS)
+            if detected > 0:
+                target_count = detected
+                print(f"Detected {target_count} total products")
+            else:
+                print("No usable 'showing N of M' banner; using default target_count")
+
+            # Collect all products via virtual scroll (streamed to OUTPUT_FILE).
+            # With SHARD_CATEGORIES set, disjoint filtered slices are scraped
+            # in parallel pages instead of one long scroll.
+            if SHARD_CATEGORIES:
+                print(f"Scraping {len(SHARD_CATEGORIES)} shards, {SHARD_CONCURRENCY} at a time...")
+                actual_count = await scrape_shards(context, page.url, SHARD_CATEGORIES, target_count)
+            else:
+                actual_count = await scroll_and_collect_all(page, table_sel, target_count)
 
             # Summary
-            actual_count = len(products)
             completion_rate = (actual_count / target_count) * 100 if target_count else 0
-            print(f"Collection complete: {actual_count}/{target_count} products ({completion_rate:.1f}%)")
+            print(f"Collection complete: {actual_count}/{target_count} products ({completion_rate:.1f}%) -> {OUTPUT_FILE}")
 
         finally:
-            if context:
-                await context.close()
-            await browser.close()
+            await context.close()
 
 
 if __name__ == "__main__":